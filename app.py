@@ -1,12 +1,32 @@
 import os
+import re
+import sys
 import json
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory
+import logging
+import time
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from types import MappingProxyType
+from flask import Flask, render_template, request, redirect, url_for, flash, session
 from flask_socketio import SocketIO, emit
 from werkzeug.security import generate_password_hash, check_password_hash
 import firebase_admin
 from firebase_admin import credentials, firestore, initialize_app
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.api_core.exceptions import FailedPrecondition, NotFound
+import gevent
+from gevent.lock import BoundedSemaphore
+from gevent.pool import Pool
+import grpc.experimental.gevent as grpc_gevent
+
+# Let Firestore's gRPC calls yield to other greenlets instead of blocking the hub; must run before any channel exists
+grpc_gevent.init_gevent()
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib parser is used as a fallback
+    orjson = None
 
 # --- Firebase Initialization ---
 # IMPORTANT: Use environment variables for secure credential management.
@@ -15,7 +35,7 @@ db = None # Initialize db as None
 
 try:
     if firebase_key_string:
-        firebase_key_dict = json.loads(firebase_key_string)
+        firebase_key_dict = (orjson.loads if orjson is not None else json.loads)(firebase_key_string)
         cred = credentials.Certificate(firebase_key_dict)
         if not firebase_admin._apps:
             initialize_app(cred)
@@ -26,16 +46,82 @@ try:
 except Exception as e:
     print(f"[ERROR] Error initializing Firebase from environment variable: {e}")
 
+# Collection references are built once and shared by every request
+USERS = FIXTURES = ACTUAL_RESULTS = SETTINGS = DEADLINES = None
+if db:
+    USERS = db.collection('users')
+    FIXTURES = db.collection('fixtures')
+    ACTUAL_RESULTS = db.collection('actual_results')
+    SETTINGS = db.collection('settings')
+    DEADLINES = db.collection('deadlines')
+    try:
+        # Prime the client's gRPC channel so the first request doesn't pay the connection handshake
+        SETTINGS.document('state').get()
+    except Exception as e:
+        print(f"[ERROR] Firestore warm-up read failed: {e}")
+
 # --- Global Constants and Data ---
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD")
 # Set a more robust BASE_DIR by assuming it's the current working directory
 BASE_DIR = os.getcwd()
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "a_very_secret_key")
+# Debug logging is opt-in (LOG_LEVEL=DEBUG) so request paths don't pay for formatting and blocking stdout writes
+app.logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
+# Sessions default to Flask's signed cookie, which needs no shared state between workers.
+# Setting REDIS_URL (with redis installed) makes it the SocketIO message queue, so emits from one worker
+# reach clients on the others; with flask-session installed as well, session payloads are kept there too.
+REDIS_URL = os.environ.get("REDIS_URL")
+socketio_message_queue = None
+if REDIS_URL:
+    try:
+        import redis
+    except ImportError:
+        print("[ERROR] REDIS_URL is set but redis is not installed; using cookie sessions and no message queue.")
+    else:
+        socketio_message_queue = REDIS_URL
+        try:
+            from flask_session import Session
+        except ImportError:
+            print("[ERROR] REDIS_URL is set but flask-session is not installed; using cookie sessions.")
+        else:
+            app.config['SESSION_TYPE'] = 'redis'
+            app.config['SESSION_REDIS'] = redis.from_url(REDIS_URL)
+            Session(app)
 
-socketio = SocketIO(app, async_mode='gevent')
+socketio = SocketIO(app, async_mode='gevent', message_queue=socketio_message_queue)
+
+@socketio.on('connect', namespace='/admin')
+def admin_connect():
+    """Only admin sessions may listen for points recalculation progress."""
+    if not session.get("admin"):
+        return False
+
+# Admin fixture inputs are named fixture_<index>_<field>
+FIXTURE_FIELD_RE = re.compile(r"fixture_(\d+)_(home|away|date|time|order)")
 
 # --- Utility Function for Loading Local JSON Files ---
+def read_json_file(filepath):
+    """Parses a JSON file in one buffered read, using orjson when it is installed."""
+    if orjson is not None:
+        with open(filepath, 'rb', buffering=65536) as f:
+            return orjson.loads(f.read())
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Parsed JSON keyed by file path, reused until the file's mtime changes
+_json_file_cache = {}
+
+def read_json_file_cached(filepath):
+    """Like read_json_file, but only re-reads and re-parses the file when its mtime changes."""
+    mtime = os.path.getmtime(filepath)
+    cached = _json_file_cache.get(filepath)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, read_json_file(filepath))
+        _json_file_cache[filepath] = cached
+    return cached[1]
+
 def load_static_json_file(filename):
     """Loads a static JSON file from the project's root directory."""
     filepath_relative = os.path.join(BASE_DIR, filename)
@@ -43,11 +129,9 @@ def load_static_json_file(filename):
     
     try:
         if os.path.exists(filepath_relative):
-            with open(filepath_relative, 'r') as f:
-                return json.load(f)
+            return read_json_file_cached(filepath_relative)
         elif os.path.exists(filepath_src):
-            with open(filepath_src, 'r') as f:
-                return json.load(f)
+            return read_json_file_cached(filepath_src)
         else:
             print(f"[ERROR] Could not find {filename} at {filepath_relative} or {filepath_src}")
             return {}
@@ -55,26 +139,83 @@ def load_static_json_file(filename):
         print(f"[ERROR] Could not load {filename}: {e}")
         return {}
 
+# stadium_traits.json is a list of stadiums; it is indexed by club so fixtures can look up their home ground
+CLUB_TO_STADIUM = {}
+
+def load_stadiums():
+    """(Re)loads the static stadium data and rebuilds the club index in place."""
+    stadiums = load_static_json_file("stadium_traits.json")
+    CLUB_TO_STADIUM.clear()
+    # Club names are interned so fixture lookups with interned home teams compare by identity. Entries are
+    # read-only views: they are shared by every enriched fixture and by the mtime-keyed JSON file cache.
+    CLUB_TO_STADIUM.update({sys.intern(stadium["club"]): MappingProxyType(stadium) for stadium in stadiums})
+
 # Load static stadium data once on app startup
-stadiums = load_static_json_file("stadium_traits.json")
+load_stadiums()
+
+# Scraped news is rewritten by run_scraper.py, so it is only re-read when the file changes.
+NEWS_FILE = os.path.join(BASE_DIR, "filtered_football_news.json")
 
-# --- Route for serving team logos and character images ---
-# This route is correctly configured to handle all files within the static folder, including subdirectories.
-@app.route('/static/<path:filename>')
-def static_files(filename):
-    """Serve all static files from the static directory."""
-    # app.static_folder is the canonical way to reference the static directory
-    return send_from_directory(app.static_folder, filename)
+def load_news():
+    """Returns the latest scraped news articles."""
+    try:
+        return read_json_file_cached(NEWS_FILE)[:5]
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[ERROR] Could not load news from {NEWS_FILE}: {e}")
+        return []
+
+# The character images only change on deploy, so the folder is re-scanned only when its mtime changes
+CHARACTERS_FOLDER = os.path.join(app.root_path, 'static', 'characters')
+_characters_cache = {"mtime": None, "list": [], "by_image": {}}
+
+def get_characters():
+    """Returns the selectable characters; raises FileNotFoundError if the folder is missing."""
+    mtime = os.stat(CHARACTERS_FOLDER).st_mtime
+    if mtime != _characters_cache["mtime"]:
+        character_files = [f for f in os.listdir(CHARACTERS_FOLDER) if f.lower().endswith(('.jpeg', '.jpg', '.png'))]
+        # Prepend the subdirectory to the image path so the URL is correct
+        _characters_cache["list"] = [
+            {'id': i + 1, 'name': os.path.splitext(f)[0], 'image': os.path.join('characters', f).replace('\\', '/')}
+            for i, f in enumerate(character_files)
+        ]
+        _characters_cache["by_image"] = {c['image']: c for c in _characters_cache["list"]}
+        _characters_cache["mtime"] = mtime
+    return _characters_cache["list"]
+
+def find_character(image):
+    """Looks up a character by its image path in the last folder scan made by get_characters()."""
+    return _characters_cache["by_image"].get(image)
 
 # --- Utility Functions for Firestore Data Fetching ---
 
+# Settings, deadlines and results documents are read on nearly every page but only change when the admin saves
+# them, which drops the cached copy in this process. Cached dicts are shared, so callers must copy before mutating.
+SETTINGS_CACHE_TTL = 300
+RESULTS_CACHE_TTL = 30
+_doc_cache = {}
+
+def get_cached_doc(doc_ref, ttl):
+    """Returns a document's data (None if it doesn't exist), re-reading it at most once per `ttl` seconds."""
+    now = time.monotonic()
+    cached = _doc_cache.get(doc_ref.path)
+    if cached and cached[0] > now:
+        return cached[1]
+    doc = doc_ref.get()
+    data = doc.to_dict() if doc.exists else None
+    _doc_cache[doc_ref.path] = (now + ttl, data)
+    return data
+
+def invalidate_doc(doc_ref):
+    """Drops a cached document after it has been written."""
+    _doc_cache.pop(doc_ref.path, None)
+
 def get_current_week_from_firestore():
     """Fetches the current week from Firestore, defaults to 1."""
     if not db: return 1
     try:
-        week_doc = db.collection('settings').document('state').get()
-        if week_doc.exists:
-            return week_doc.to_dict().get('current_week', 1)
+        week_data = get_cached_doc(SETTINGS.document('state'), SETTINGS_CACHE_TTL)
+        if week_data is not None:
+            return week_data.get('current_week', 1)
     except Exception as e:
         print(f"[ERROR] Failed to fetch current week from Firestore: {e}")
     return 1
@@ -83,9 +224,9 @@ def get_deadlines_from_firestore():
     """Fetches prediction deadlines from Firestore."""
     if not db: return {}
     try:
-        deadlines_doc = db.collection('deadlines').document('all_deadlines').get()
-        if deadlines_doc.exists:
-            return deadlines_doc.to_dict().get('deadlines', {})
+        deadlines_data = get_cached_doc(DEADLINES.document('all_deadlines'), SETTINGS_CACHE_TTL)
+        if deadlines_data is not None:
+            return deadlines_data.get('deadlines', {})
     except Exception as e:
         print(f"[ERROR] Failed to fetch deadlines from Firestore: {e}")
     return {}
@@ -94,141 +235,354 @@ def get_actual_results_for_week(week):
     """Fetches actual results for a specific week from Firestore."""
     if not db: return {}
     try:
-        results_doc = db.collection('actual_results').document(str(week)).get()
-        if results_doc.exists:
-            return results_doc.to_dict().get('results', {})
+        results_data = get_cached_doc(ACTUAL_RESULTS.document(str(week)), RESULTS_CACHE_TTL)
+        if results_data is not None:
+            return results_data.get('results', {})
     except Exception as e:
         print(f"[ERROR] Failed to fetch actual results for week {week}: {e}")
     return {}
 
+# Anything but ASCII letters, digits and underscores is replaced in a score input's form-field name
+FORM_KEY_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_]")
+
+def match_form_key(match):
+    """Returns the form-field prefix for a match's score inputs, e.g. "Man Utd vs Spurs" -> "Man_Utd_vs_Spurs"."""
+    return FORM_KEY_UNSAFE_RE.sub("_", match)
+
+def get_fixtures_for_week(week):
+    """Fetches a week's fixtures from Firestore in display order. Errors propagate to the caller.
+
+    Each fixture carries its home_team, away_team and score input names (home_key, away_key), so routes
+    and templates never re-split or re-encode the match string. Fixtures saved before the teams were
+    stored are split on load.
+    """
+    # Sorted server-side; needs the (week, order) composite index in firestore.indexes.json
+    fixtures_docs = FIXTURES.where(filter=FieldFilter("week", "==", week)).order_by("order").stream()
+    fixtures_list = []
+    for doc in fixtures_docs:
+        fixture = doc.to_dict()
+        match = fixture['match']
+        if 'home_team' not in fixture or 'away_team' not in fixture:
+            fixture['home_team'], _, fixture['away_team'] = match.partition(" vs ")
+        fixture['home_team'] = sys.intern(fixture['home_team'])
+        form_key = match_form_key(match)
+        fixture['home_key'] = form_key + "_home"
+        fixture['away_key'] = form_key + "_away"
+        fixtures_list.append(fixture)
+    return fixtures_list
+
+# Short-lived per-process cache of user documents, so repeated page views skip the Firestore round-trip.
+# Entries are dropped whenever this process writes to the user; other workers' writes show up within the TTL.
+# Unknown usernames are remembered for the same TTL, so a user who just registered on another worker
+# can be refused login by this one for at most USER_CACHE_TTL seconds.
+USER_CACHE_TTL = 10
+USER_CACHE_MAX = 10000
+_user_cache = {}
+
+def get_user_data(username):
+    """Returns a user's document as a dict, or None if the user doesn't exist. Errors propagate to the caller."""
+    now = time.monotonic()
+    cached = _user_cache.get(username)
+    if cached and cached[0] > now:
+        return cached[1]
+    user_doc = USERS.document(username).get()
+    if len(_user_cache) >= USER_CACHE_MAX:
+        _user_cache.clear()
+    if not user_doc.exists:
+        _user_cache[username] = (now + USER_CACHE_TTL, None)
+        return None
+    user_data = user_doc.to_dict()
+    _user_cache[username] = (now + USER_CACHE_TTL, user_data)
+    return user_data
+
+def invalidate_user(username):
+    """Drops a user's cached document after it has been written."""
+    _user_cache.pop(username, None)
+
+# PBKDF2 hashing is deliberately slow and would stall every greenlet on the worker; hashlib releases the GIL,
+# so running it on gevent's native threadpool lets the hub keep serving other requests meanwhile.
+def hash_password(password):
+    """Hashes a password off the gevent hub."""
+    return gevent.get_hub().threadpool.apply(generate_password_hash, (password,))
+
+def verify_password(stored_hash, password):
+    """Checks a password against its stored hash off the gevent hub."""
+    return gevent.get_hub().threadpool.apply(check_password_hash, (stored_hash, password))
+
 
 # --- Utility Functions ---
 
-def update_user_points_for_week(username, week, new_points):
-    """Updates a user's points in Firestore for a given week."""
-    if not db: return
+# Firestore caps a write batch at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+def chunked(items, size=FIRESTORE_BATCH_LIMIT):
+    """Yields successive slices of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# How many points batches are committed concurrently; each commit is an independent Firestore RPC
+POINTS_WRITE_CONCURRENCY = int(os.environ.get("POINTS_WRITE_CONCURRENCY", 8))
+
+def commit_points_updates(updates, week_key, actual_index):
+    """Commits one batch of (username, update_time, fields) points updates, drops the users' cached documents
+    and returns the count.
+
+    Each update only applies if the user is unchanged since `update_time`, when their points were read. If any
+    user changed, the batch is rejected as a whole and its users are rescored one by one in transactions.
+    """
+    batch = db.batch()
+    for username, update_time, fields in updates:
+        batch.update(USERS.document(username), fields, option=db.write_option(last_update_time=update_time))
     try:
-        user_ref = db.collection('users').document(username)
-        user_doc = user_ref.get()
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            points_by_week = user_data.get("points_by_week", {})
-            points_by_week[str(week)] = new_points
-            total_points = sum(points_by_week.values())
-            user_ref.update({
-                'points_by_week': points_by_week,
-                'points': total_points
-            })
-            print(f"[DEBUG] Updated points for {username}: total={total_points}, week {week}={new_points}")
-    except Exception as e:
-        print(f"[ERROR] Failed to update user points: {e}")
+        batch.commit()
+    except (FailedPrecondition, NotFound):
+        for username, _, _ in updates:
+            rescore_user_week(db.transaction(), USERS.document(username), week_key, actual_index)
+    for username, _, _ in updates:
+        invalidate_user(username)
+    return len(updates)
+
+def delete_collection(collection_ref):
+    """Deletes every document in a collection, a page of at most FIRESTORE_BATCH_LIMIT at a time, one commit per page."""
+    while True:
+        # Projecting to the document ID reads only document names; an empty select() would return every field
+        docs = list(collection_ref.select([FieldPath.document_id()]).limit(FIRESTORE_BATCH_LIMIT).stream())
+        if not docs:
+            return
+        batch = db.batch()
+        for doc in docs:
+            batch.delete(doc.reference)
+        batch.commit()
+
+def build_points_update(user_data, week_key, new_points):
+    """Returns the Firestore fields that record a user's new points for a week, or None if they are unchanged.
+
+    The total is adjusted with a server-side Increment by the week's delta. The delta is only right if the
+    week's points haven't changed since `user_data` was read, so writes must be preconditioned on that read.
+    """
+    old_points = user_data.get("points_by_week", {}).get(week_key)
+    if old_points == new_points:
+        return None
+    return {
+        FieldPath('points_by_week', week_key).to_api_repr(): new_points,
+        'points': firestore.Increment(new_points - (old_points or 0))
+    }
+
+# Shared read-only default so lookups for users/weeks without predictions don't allocate fresh dicts
+EMPTY_PREDICTIONS = MappingProxyType({})
+
+def get_week_predictions(user_data, week_key):
+    """Returns a user's {match: {"home", "away"}} predictions for the week keyed by str(week)."""
+    return user_data.get("predictions", EMPTY_PREDICTIONS).get(week_key, EMPTY_PREDICTIONS)
+
+def get_result(home, away):
+    """Returns the outcome of a scoreline from the home side's point of view: 1 win, 0 draw, -1 loss."""
+    return (home > away) - (home < away)
+
+def build_actual_index(actual_week_data):
+    """Pre-computes (home, away, result) for every played match so it is derived once, not once per user."""
+    return {
+        match: (actual['home'], actual['away'], get_result(actual['home'], actual['away']))
+        for match, actual in actual_week_data.items()
+    }
+
+def calculate_points_for_user_week(user_preds, actual_index):
+    """Scores a user's predictions for a week: 3 points for an exact score, 1 for the correct result."""
+    if not user_preds or not actual_index:
+        return 0
+    points = 0
+    for match, pred in user_preds.items():
+        actual = actual_index.get(match)
+        if actual is None:
+            continue
+        home, away = pred['home'], pred['away']
+        if home == actual[0] and away == actual[1]:
+            points += 3
+        elif get_result(home, away) == actual[2]:
+            points += 1
+    return points
+
+def points_scoring_fields(week_key):
+    """Returns the field paths needed to score a week: its predictions and points, not the user's full history."""
+    return [
+        FieldPath('predictions', week_key).to_api_repr(),
+        FieldPath('points_by_week', week_key).to_api_repr(),
+    ]
+
+@firestore.transactional
+def rescore_user_week(transaction, user_ref, week_key, actual_index):
+    """Re-reads and rescores one user's week inside a transaction, for users who changed after the bulk read."""
+    user_doc = user_ref.get(field_paths=points_scoring_fields(week_key), transaction=transaction)
+    if not user_doc.exists:
+        return
+    user_data = user_doc.to_dict()
+    points = calculate_points_for_user_week(get_week_predictions(user_data, week_key), actual_index)
+    fields = build_points_update(user_data, week_key, points)
+    if fields:
+        transaction.update(user_ref, fields)
+
+# One recalculation per week at a time: a second results save waits for the first to finish writing
+_recalc_locks = {}
 
 def update_all_user_points_for_week(week):
     """Recalculates points for all users for a specific week based on actual results."""
     if not db: return
+    with _recalc_locks.setdefault(week, BoundedSemaphore()):
+        recalculate_week_points(week)
+
+def recalculate_week_points(week):
+    """Scores every user's predictions for the week and commits the changed points, reporting progress to admins."""
     try:
         actual_week_data = get_actual_results_for_week(week)
         if not actual_week_data:
             print(f"[INFO] No actual results for week {week}. Skipping point update.")
             return
 
-        users_stream = db.collection('users').stream()
+        week_key = str(week)
+        actual_index = build_actual_index(actual_week_data)
 
-        for user_doc in users_stream:
-            username = user_doc.id
+        # Score everyone in one pure pass before any writes, reusing the streamed documents
+        # instead of re-reading each user, so the stream isn't held open across RPCs
+        updates = []
+        for user_doc in USERS.select(points_scoring_fields(week_key)).stream():
             user_data = user_doc.to_dict()
-            user_preds = user_data.get("predictions", {}).get(str(week), {})
-            
-            if not user_preds:
-                continue
-
-            points = 0
-            for match, pred in user_preds.items():
-                if match in actual_week_data:
-                    actual = actual_week_data[match]
-                    if pred['home'] == actual['home'] and pred['away'] == actual['away']:
-                        points += 3
-                    elif (pred['home'] > pred['away'] and actual['home'] > actual['away']) or \
-                         (pred['home'] < pred['away'] and actual['home'] < actual['away']) or \
-                         (pred['home'] == pred['away'] and actual['home'] == actual['away']):
-                        points += 1
-            
-            update_user_points_for_week(username, week, points)
+            user_preds = get_week_predictions(user_data, week_key)
+            if user_preds:
+                points = calculate_points_for_user_week(user_preds, actual_index)
+                fields = build_points_update(user_data, week_key, points)
+                if fields:
+                    updates.append((user_doc.id, user_doc.update_time, fields))
+
+        # Progress goes to admin panels listening on the /admin namespace, one event per committed batch
+        # and a final one once everything is written, even if nobody's points changed
+        done = 0
+        commit = partial(commit_points_updates, week_key=week_key, actual_index=actual_index)
+        for committed in Pool(POINTS_WRITE_CONCURRENCY).imap_unordered(commit, list(chunked(updates))):
+            done += committed
+            if done < len(updates):
+                socketio.emit('recalc_progress', {'week': week, 'done': done, 'total': len(updates)}, namespace='/admin')
+        socketio.emit('recalc_progress', {'week': week, 'done': done, 'total': len(updates)}, namespace='/admin')
+        app.logger.debug("Updated week %s points for %s users", week, len(updates))
 
     except Exception as e:
         print(f"[ERROR] Failed to update all user points: {e}")
+        # The admin was only told the recalculation started, so report the failure to their panel too
+        socketio.emit('recalc_failed', {'week': week, 'error': str(e)}, namespace='/admin')
+
+# Admin-entered dates and times are UTC; parsed values are timezone-aware so they compare with datetime.now(timezone.utc)
+NO_DEADLINE = datetime.max.replace(tzinfo=timezone.utc)
+
+@lru_cache(maxsize=512)
+def parse_datetime(value):
+    """Parses a "%Y-%m-%dT%H:%M" UTC string, memoized since the same fixture and deadline strings recur every request."""
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc)
+
+def get_deadline_for_week(prediction_deadlines, week):
+    """Returns the parsed prediction deadline for a week, or None if it is unset or malformed."""
+    deadline_str = prediction_deadlines.get(str(week))
+    if not deadline_str:
+        return None
+    try:
+        return parse_datetime(deadline_str)
+    except ValueError:
+        print(f"[ERROR] Invalid deadline format for week {week}: {deadline_str}")
+        return None
 
-def attach_stadium_info(fixtures_list):
-    """Adds stadium and city info to fixture objects using the globally loaded stadium data."""
-    for fixture in fixtures_list:
-        home_team = fixture['match'].split(" vs ")[0]
-        # Use the globally loaded 'stadiums' variable
-        stadium_info = stadiums.get(home_team, {})
-        fixture['stadium'] = stadium_info.get('stadium')
-        fixture['city'] = stadium_info.get('city')
-    return fixtures_list
+MAX_SCORE = 99
 
-def parse_fixtures_dates(fixtures_list):
-    """Parses date and time strings into datetime objects."""
+def parse_score(value):
+    """Parses a submitted score in a single pass; returns None for blank, non-numeric or out-of-range input."""
+    try:
+        score = int(value)
+    except (TypeError, ValueError):
+        return None
+    return score if 0 <= score <= MAX_SCORE else None
+
+def parse_fixture_datetime(fixture):
+    """Returns the fixture's kick-off as a datetime, or None if its date or time is missing or malformed."""
+    try:
+        return parse_datetime(f"{fixture['date']}T{fixture['time']}")
+    except (KeyError, ValueError):
+        return None
+
+def enrich_fixtures(fixtures_list):
+    """Returns new fixture dicts with stadium info and kick-off datetime attached, leaving the inputs untouched."""
+    enriched = []
     for fixture in fixtures_list:
-        try:
-            fixture_datetime = datetime.strptime(f"{fixture['date']}T{fixture['time']}", "%Y-%m-%dT%H:%M")
-            fixture['datetime_obj'] = fixture_datetime
-        except (KeyError, ValueError):
-            fixture['datetime_obj'] = None
-    return fixtures_list
+        stadium_info = CLUB_TO_STADIUM.get(fixture['home_team'])
+        enriched.append(dict(fixture,
+                             stadium=stadium_info["name"] if stadium_info else None,
+                             stadium_info=stadium_info,
+                             datetime_obj=parse_fixture_datetime(fixture)))
+    return tuple(enriched)
+
+# Enriched fixtures per week, shared across greenlets and never mutated after being built. Fixtures only
+# change when the admin saves them, which clears this cache; the TTL bounds how long another worker's save can go unseen.
+FIXTURES_CACHE_TTL = 30
+_fixtures_cache = {}
+
+def get_enriched_fixtures(week):
+    """Returns a week's ordered fixtures with stadium info and parsed datetimes, as a read-only shared tuple."""
+    now = time.monotonic()
+    cached = _fixtures_cache.get(week)
+    if cached and cached[0] > now:
+        return cached[1]
+    fixtures = enrich_fixtures(get_fixtures_for_week(week))
+    _fixtures_cache[week] = (now + FIXTURES_CACHE_TTL, fixtures)
+    return fixtures
+
+def invalidate_fixtures():
+    """Drops all cached fixture lists after fixtures have been written."""
+    _fixtures_cache.clear()
 
 
 # --- ROUTES ---
 @app.route("/")
 def index():
-    return render_template("index.html")
-    
+    return render_template("index.html", news=load_news())
+
+@app.route('/news')
+def news():
+    return render_template("news.html", news=load_news())
+
 @app.route('/check_db')
 def check_db():
     if not db:
         return "Database not connected. Please check your environment variables.", 500
     try:
         # Attempt a simple query to verify connection
-        db.collection('settings').document('state').get()
+        SETTINGS.document('state').get()
         return "Database connection successful! 🎉", 200
     except Exception as e:
         return f"Database connection failed: {e}", 500
 
 @app.route('/register', methods=["GET", "POST"])
 def register():
-    print("[DEBUG] Register route accessed.")
+    app.logger.debug("Register route accessed.")
     if not db:
         print("[ERROR] Database not connected. Redirecting to index.")
         flash("Database not connected. Please contact the administrator.", "error")
         return redirect(url_for("index"))
         
     characters = []
-    characters_folder_path = os.path.join(app.root_path, 'static', 'characters')
     try:
-        if os.path.exists(characters_folder_path):
-            character_files = [f for f in os.listdir(characters_folder_path) if f.lower().endswith(('.jpeg', '.jpg', '.png'))]
-            # Fix: Prepend the subdirectory to the image path so the URL is correct
-            characters = [
-                {'id': i + 1, 'name': os.path.splitext(f)[0], 'image': os.path.join('characters', f).replace('\\', '/')}
-                for i, f in enumerate(character_files)
-            ]
-            print(f"[DEBUG] Found {len(characters)} characters.")
-        else:
-            print(f"[ERROR] Directory not found: {characters_folder_path}")
-            flash("Character images not found. Contact the administrator.", "error")
+        characters = get_characters()
+        app.logger.debug("Found %s characters.", len(characters))
+    except FileNotFoundError:
+        print(f"[ERROR] Directory not found: {CHARACTERS_FOLDER}")
+        flash("Character images not found. Contact the administrator.", "error")
     except Exception as e:
-        print(f"[ERROR] Failed to load character images from {characters_folder_path}: {e}")
+        print(f"[ERROR] Failed to load character images from {CHARACTERS_FOLDER}: {e}")
         flash(f"Failed to load characters: {str(e)}", "error")
 
     if request.method == "POST":
-        print("[DEBUG] Processing POST request for registration.")
+        app.logger.debug("Processing POST request for registration.")
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
         confirm_password = request.form.get("confirm_password", "")
         character_image_name = request.form.get("character", "")
         
-        print(f"[DEBUG] Form data received - Username: '{username}', Character: '{character_image_name}'")
+        app.logger.debug("Form data received - Username: '%s', Character: '%s'", username, character_image_name)
 
         if not username or not password or not confirm_password or not character_image_name:
             print("[ERROR] Missing required form fields.")
@@ -245,7 +599,7 @@ def register():
             flash("Password must be at least 8 characters long.", "error")
             return redirect(url_for("register"))
         
-        selected_character = next((c for c in characters if c['image'] == character_image_name), None)
+        selected_character = find_character(character_image_name)
         if not selected_character:
             print(f"[ERROR] Selected character '{character_image_name}' not found in loaded characters list.")
             flash("Invalid character selection.", "error")
@@ -253,15 +607,15 @@ def register():
 
 
         try:
-            print(f"[DEBUG] Checking if username '{username}' exists.")
-            user_ref = db.collection('users').document(username)
+            app.logger.debug("Checking if username '%s' exists.", username)
+            user_ref = USERS.document(username)
             if user_ref.get().exists:
                 print(f"[ERROR] Username '{username}' already exists.")
                 flash("Username already taken. Please choose another.", "error")
                 return redirect(url_for("register"))
             
-            print(f"[DEBUG] Username '{username}' is available. Hashing password.")
-            hashed_pw = generate_password_hash(password)
+            app.logger.debug("Username '%s' is available. Hashing password.", username)
+            hashed_pw = hash_password(password)
             
             user_data = {
                 "password": hashed_pw,
@@ -272,9 +626,10 @@ def register():
                 "points_by_week": {}
             }
             
-            print(f"[DEBUG] Saving new user data for '{username}'.")
+            app.logger.debug("Saving new user data for '%s'.", username)
             user_ref.set(user_data)
-            print(f"[DEBUG] User '{username}' successfully registered and saved.")
+            invalidate_user(username)
+            app.logger.debug("User '%s' successfully registered and saved.", username)
             flash("Registration successful! Please log in.", "success")
             return redirect(url_for("login"))
             
@@ -301,13 +656,12 @@ def login():
             return redirect(url_for("login"))
 
         try:
-            user_doc = db.collection('users').document(username).get()
+            user_data = get_user_data(username)
 
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
+            if user_data:
                 stored_hash = user_data.get("password")
 
-                if stored_hash and check_password_hash(stored_hash, password):
+                if stored_hash and verify_password(stored_hash, password):
                     session["user"] = username
                     flash(f"Welcome back, {username}!", "success")
                     return redirect(url_for("profile"))
@@ -339,36 +693,32 @@ def profile():
         return redirect(url_for("login"))
     
     username = session["user"]
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
     
-    # Fetch all data from Firestore
+    # Fetch all data from Firestore, issuing the independent reads concurrently
+    user_job = gevent.spawn(get_user_data, username)
+    deadlines_job = gevent.spawn(get_deadlines_from_firestore)
     current_week = get_current_week_from_firestore()
-    prediction_deadlines = get_deadlines_from_firestore()
-    actual_results = get_actual_results_for_week(current_week)
+    results_job = gevent.spawn(get_actual_results_for_week, current_week)
+    fixtures_job = gevent.spawn(get_enriched_fixtures, current_week)
+    prediction_deadlines = deadlines_job.get()
+    actual_results = results_job.get()
 
     try:
-        fixtures_docs = db.collection('fixtures').where(filter=FieldFilter("week", "==", current_week)).stream()
-        fixtures_list = [doc.to_dict() for doc in fixtures_docs]
-        fixtures_list.sort(key=lambda x: x.get("order", float('inf')))
-
-        # Use the globally loaded 'stadiums' variable
-        fixtures_with_info = attach_stadium_info(fixtures_list)
-        fixtures_with_info = parse_fixtures_dates(fixtures_with_info)
+        fixtures_with_info = fixtures_job.get()
     except Exception as e:
         print(f"[ERROR] Failed to load fixtures for profile: {e}")
         fixtures_with_info = []
 
-    deadline_str = prediction_deadlines.get(str(current_week))
-    prediction_deadline = datetime.strptime(deadline_str, "%Y-%m-%dT%H:%M") if deadline_str else datetime.max
+    prediction_deadline = get_deadline_for_week(prediction_deadlines, current_week) or NO_DEADLINE
     
     try:
-        user_doc = db.collection('users').document(username).get()
-        if not user_doc.exists:
+        user_data = user_job.get()
+        if not user_data:
             flash("User not found.", "error")
             return redirect(url_for("logout"))
             
-        user_data = user_doc.to_dict()
-        user_preds = user_data.get("predictions", {}).get(str(current_week), {})
+        user_preds = get_week_predictions(user_data, str(current_week))
 
         if request.method == "POST":
             if now > prediction_deadline:
@@ -378,16 +728,17 @@ def profile():
             user_week_preds = {}
             for fixture in fixtures_with_info:
                 match = fixture["match"]
-                home_key = match.replace(" ", "_").replace(".", "_") + "_home"
-                away_key = match.replace(" ", "_").replace("-", "_") + "_away"
-                home_score = request.form.get(home_key)
-                away_score = request.form.get(away_key)
+                home_score = parse_score(request.form.get(fixture["home_key"]))
+                away_score = parse_score(request.form.get(fixture["away_key"]))
                 
-                if home_score and away_score and home_score.isdigit() and away_score.isdigit():
-                    user_week_preds[match] = {"home": int(home_score), "away": int(away_score)}
+                if home_score is not None and away_score is not None:
+                    user_week_preds[match] = {"home": home_score, "away": away_score}
             
-            user_data["predictions"][str(current_week)] = user_week_preds
-            db.collection('users').document(username).update({"predictions": user_data["predictions"]})
+            # Write only this week's predictions rather than the user's whole history
+            USERS.document(username).update({
+                FieldPath('predictions', str(current_week)).to_api_repr(): user_week_preds
+            })
+            invalidate_user(username)
             
             flash(f"Predictions saved!", "success")
             return redirect(url_for("profile"))
@@ -402,6 +753,10 @@ def profile():
                            current_week=current_week, prediction_deadline=prediction_deadline, now=now)
 
 
+LEADERBOARD_FIELDS = ['points', 'points_by_week', 'group']
+LEADERBOARD_PAGE_SIZE = 50
+LEADERBOARD_MAX_PAGE_SIZE = 200
+
 @app.route('/leaderboard')
 def leaderboard():
     if not db:
@@ -410,15 +765,27 @@ def leaderboard():
         
     current_week = get_current_week_from_firestore()
 
+    # Pages are read with a Firestore cursor: `cursor` is the last username on the previous page
+    # and `start` is the rank offset it ended at, so only one page of users is read per request.
+    size = max(1, min(request.args.get("size", LEADERBOARD_PAGE_SIZE, type=int), LEADERBOARD_MAX_PAGE_SIZE))
+    cursor = request.args.get("cursor")
+    start = max(request.args.get("start", 0, type=int) or 0, 0)
+    next_page = None
+
     try:
-        users_stream = db.collection('users').stream()
-        all_users = {doc.id: doc.to_dict() for doc in users_stream}
-        sorted_users = sorted(all_users.items(), key=lambda x: x[1].get("points", 0), reverse=True)
+        # Project only the leaderboard columns; full documents carry every prediction and the password hash
+        query = USERS.select(LEADERBOARD_FIELDS).order_by('points', direction=firestore.Query.DESCENDING)
+        if cursor:
+            cursor_doc = USERS.document(cursor).get(field_paths=['points'])
+            if cursor_doc.exists:
+                query = query.start_after(cursor_doc)
+        # One extra row tells us whether there is a next page
+        page_docs = list(query.limit(size + 1).stream())
+        sorted_users = [(doc.id, doc.to_dict()) for doc in page_docs[:size]]
+        if len(page_docs) > size:
+            next_page = url_for("leaderboard", cursor=sorted_users[-1][0], start=start + size, size=size)
         
-        all_weeks = set()
-        for _, data in all_users.items():
-            if "points_by_week" in data:
-                all_weeks.update(data["points_by_week"].keys())
+        all_weeks = set().union(*(data.get("points_by_week", ()) for _, data in sorted_users))
         weeks = sorted(all_weeks, key=int)
         
     except Exception as e:
@@ -428,7 +795,8 @@ def leaderboard():
         weeks = []
 
     return render_template("leaderboard.html", users=sorted_users, weeks=weeks,
-                           show_weekly=True, current_week=current_week)
+                           show_weekly=True, current_week=current_week,
+                           rank_offset=start, next_page=next_page)
 
 @app.route('/admin', methods=["GET", "POST"])
 def admin():
@@ -460,83 +828,108 @@ def admin_panel():
     prediction_deadlines = get_deadlines_from_firestore()
 
     if request.method == "POST":
+        # Only inputs that failed validation are kept for re-display, so the signed session cookie stays small
+        form_data = {}
         try:
             if "save_settings" in request.form:
                 new_week = request.form.get("current_week")
                 if new_week and new_week.isdigit():
                     current_week = int(new_week)
-                    db.collection('settings').document('state').set({'current_week': current_week})
+                    SETTINGS.document('state').set({'current_week': current_week})
+                    invalidate_doc(SETTINGS.document('state'))
                     flash(f"Current week set to {current_week}", "success")
                 else:
+                    if new_week:
+                        form_data["current_week"] = new_week
                     flash("Invalid week number.", "error")
                     
                 deadline_str = request.form.get("prediction_deadline")
                 if deadline_str:
                     try:
-                        datetime.strptime(deadline_str, "%Y-%m-%dT%H:%M")
-                        prediction_deadlines[str(current_week)] = deadline_str
-                        db.collection('deadlines').document('all_deadlines').set({'deadlines': prediction_deadlines})
+                        parse_datetime(deadline_str)
+                        prediction_deadlines = {**prediction_deadlines, str(current_week): deadline_str}
+                        DEADLINES.document('all_deadlines').set({'deadlines': prediction_deadlines})
+                        invalidate_doc(DEADLINES.document('all_deadlines'))
                         flash("Prediction deadline updated.", "success")
                     except ValueError:
+                        form_data["prediction_deadline"] = deadline_str
                         flash("Invalid deadline format.", "error")
         
             if "update_fixtures" in request.form:
-                updated_fixtures = []
-                i = 1
-                while f"fixture_{i}_home" in request.form:
-                    home = request.form.get(f"fixture_{i}_home", "").strip()
-                    away = request.form.get(f"fixture_{i}_away", "").strip()
-                    date = request.form.get(f"fixture_{i}_date", "").strip()
-                    time = request.form.get(f"fixture_{i}_time", "").strip()
-                    order = request.form.get(f"fixture_{i}_order", str(i)).strip()
+                # Group the fixture inputs by index in a single pass over the form
+                fixture_fields = {}
+                for key, value in request.form.items():
+                    m = FIXTURE_FIELD_RE.fullmatch(key)
+                    if m:
+                        fixture_fields.setdefault(int(m.group(1)), {})[m.group(2)] = value.strip()
+
+                updated_fixtures = {}
+                invalid_rows = False
+                for i in sorted(fixture_fields):
+                    fields = fixture_fields[i]
+                    home = fields.get("home", "")
+                    away = fields.get("away", "")
+                    date = fields.get("date", "")
+                    time = fields.get("time", "")
+                    order = fields.get("order", str(i))
                     
                     if home and away and date and time:
                         try:
-                            datetime.strptime(f"{date}T{time}", "%Y-%m-%dT%H:%M")
+                            parse_datetime(f"{date}T{time}")
                             fixture_doc = {
                                 "match": f"{home} vs {away}",
+                                "home_team": home,
+                                "away_team": away,
                                 "date": date,
                                 "time": time,
                                 "order": int(order) if order.isdigit() else i,
                                 "week": current_week
                             }
-                            updated_fixtures.append(fixture_doc)
+                            # Deterministic IDs make re-saving the form overwrite fixtures rather than duplicate them
+                            updated_fixtures[f"w{current_week}_{i:03d}"] = fixture_doc
                             
                         except ValueError:
+                            invalid_rows = True
+                            form_data.update({f"fixture_{i}_{field}": value for field, value in fields.items()})
                             flash(f"Fixture {i}: Invalid date/time format. Use YYYY-MM-DD and HH:MM.", "error")
-                    i += 1
                 
                 if updated_fixtures:
                     batch = db.batch()
-                    for fixture in updated_fixtures:
-                        fixture_ref = db.collection('fixtures').document()
-                        batch.set(fixture_ref, fixture)
+                    # The form holds the whole week, so other fixtures stored for it (including auto-ID duplicates
+                    # from older saves) are dropped in the same commit; kept if a row failed so it isn't lost
+                    if not invalid_rows:
+                        week_query = FIXTURES.where(filter=FieldFilter("week", "==", current_week))
+                        week_docs = week_query.select([FieldPath.document_id()]).stream()
+                        for doc in week_docs:
+                            if doc.id not in updated_fixtures:
+                                batch.delete(doc.reference)
+                    for fixture_id, fixture in updated_fixtures.items():
+                        batch.set(FIXTURES.document(fixture_id), fixture)
                     batch.commit()
+                    invalidate_fixtures()
                     flash(f"Saved {len(updated_fixtures)} fixtures to Firestore.", "success")
                 else:
                     flash("No valid fixtures provided.", "error")
         
             if "update_results" in request.form:
-                fixtures_docs = db.collection('fixtures').where(filter=FieldFilter("week", "==", current_week)).stream()
-                fixtures_list = [doc.to_dict() for doc in fixtures_docs]
                 week_actuals = {}
-                for fixture in fixtures_list:
+                for fixture in get_enriched_fixtures(current_week):
                     match = fixture["match"]
-                    home_key = match.replace(" ", "_").replace(".", "_") + "_home"
-                    away_key = match.replace(" ", "_").replace("-", "_") + "_away"
-                    home_score = request.form.get(home_key)
-                    away_score = request.form.get(away_key)
+                    home_score = parse_score(request.form.get(fixture["home_key"]))
+                    away_score = parse_score(request.form.get(fixture["away_key"]))
                     
-                    if home_score and away_score and home_score.isdigit() and away_score.isdigit():
+                    if home_score is not None and away_score is not None:
                         week_actuals[match] = {
-                            "home": int(home_score),
-                            "away": int(away_score)
+                            "home": home_score,
+                            "away": away_score
                         }
                 
                 if week_actuals:
-                    db.collection('actual_results').document(str(current_week)).set({'results': week_actuals})
-                    update_all_user_points_for_week(current_week)
-                    flash("Actual results updated and points recalculated.", "success")
+                    ACTUAL_RESULTS.document(str(current_week)).set({'results': week_actuals})
+                    invalidate_doc(ACTUAL_RESULTS.document(str(current_week)))
+                    # Rescoring every user can take a while; it runs in the background and reports progress over SocketIO
+                    gevent.spawn(update_all_user_points_for_week, current_week)
+                    flash("Actual results saved; points are being recalculated in the background.", "success")
                 else:
                     flash("No valid scores provided.", "error")
         
@@ -546,39 +939,34 @@ def admin_panel():
         except Exception as e:
             flash(f"Error processing form: {str(e)}", "error")
             print(f"[ERROR] Firestore error processing form: {e}")
-            
+
+        if form_data:
+            session["form_data"] = form_data
         return redirect(url_for("admin_panel"))
 
     # GET: Render template
+    form_data = session.pop("form_data", {})
     try:
-        fixtures_docs = db.collection('fixtures').where(filter=FieldFilter("week", "==", current_week)).stream()
-        fixtures_list = [doc.to_dict() for doc in fixtures_docs]
-        fixtures_list.sort(key=lambda x: x.get("order", float('inf')))
+        fixtures_with_info = get_enriched_fixtures(current_week)
 
         week_actuals = get_actual_results_for_week(current_week)
     except Exception as e:
         flash(f"Error loading admin data: {str(e)}", "error")
         print(f"[ERROR] Firestore error loading admin data: {e}")
-        fixtures_list = []
+        fixtures_with_info = []
         week_actuals = {}
     
-    deadline_str = prediction_deadlines.get(str(current_week))
-    prediction_deadline = None
-    if deadline_str:
-        try:
-            prediction_deadline = datetime.strptime(deadline_str, "%Y-%m-%dT%H:%M")
-        except ValueError:
-            flash("Invalid deadline format in data.", "error")
-    
-    # Use the globally loaded 'stadiums' variable
-    fixtures_with_info = attach_stadium_info(fixtures_list)
-    fixtures_with_info = parse_fixtures_dates(fixtures_with_info)
+    prediction_deadline = get_deadline_for_week(prediction_deadlines, current_week)
+    if prediction_deadline is None and prediction_deadlines.get(str(current_week)):
+        flash("Invalid deadline format in data.", "error")
+
 
     return render_template("admin_panel.html",
                            current_week=current_week,
                            fixtures=fixtures_with_info,
                            actuals=week_actuals,
-                           prediction_deadline=prediction_deadline)
+                           prediction_deadline=prediction_deadline,
+                           form_data=form_data)
 
 @app.route('/admin/reset')
 def admin_reset():
@@ -591,13 +979,14 @@ def admin_reset():
         return redirect(url_for("admin"))
 
     try:
-        collections_to_reset = ['users', 'fixtures', 'actual_results', 'deadlines', 'settings']
-        for collection_name in collections_to_reset:
-            collection_ref = db.collection(collection_name)
-            docs = collection_ref.stream()
-            for doc in docs:
-                doc.reference.delete()
-        
+        collections_to_reset = [USERS, FIXTURES, ACTUAL_RESULTS, DEADLINES, SETTINGS]
+        # Collections are emptied concurrently, each in bounded pages so memory doesn't grow with its size
+        Pool(len(collections_to_reset)).map(delete_collection, collections_to_reset)
+
+        _user_cache.clear()
+        _doc_cache.clear()
+        invalidate_fixtures()
+        load_stadiums()
         flash("All data has been reset. App is now in a clean state.", "success")
     except Exception as e:
         flash(f"Error during data reset: {str(e)}", "error")
@@ -607,8 +996,14 @@ def admin_reset():
 
 
 if __name__ == "__main__":
-    with app.app_context():
-        print("Registered routes:")
-        for rule in app.url_map.iter_rules():
-            print(f"[DEBUG] Endpoint: {rule.endpoint}, URL: {rule}")
-    socketio.run(app, debug=True)
+    if os.environ.get("FLASK_ENV") == "production":
+        raise SystemExit("The development server is not for production; run `gunicorn app:app` (see gunicorn.conf.py).")
+    if app.logger.isEnabledFor(logging.DEBUG):
+        with app.app_context():
+            app.logger.debug("Registered routes:")
+            for rule in app.url_map.iter_rules():
+                app.logger.debug("Endpoint: %s, URL: %s", rule.endpoint, rule)
+    # Local development only; production runs under gunicorn (see gunicorn.conf.py).
+    # Debug mode disables template caching and enables the reloader, so it is opt-in.
+    socketio.run(app, host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", 5000)),
+                 debug=os.environ.get("FLASK_DEBUG") == "1")
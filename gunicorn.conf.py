@@ -0,0 +1,28 @@
+# Gunicorn settings for production (picked up automatically from the working directory).
+# The app runs Flask-SocketIO in gevent mode, so it needs the gevent websocket worker.
+import multiprocessing
+import os
+import resource
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "geventwebsocket.gunicorn.workers.GeventWebSocketWorker"
+# Flask-SocketIO keeps connection state per process, so more than one worker needs REDIS_URL (used as the
+# SocketIO message queue) and sticky sessions at the load balancer. Without Redis, keep a single worker.
+# WEB_CONCURRENCY=auto uses 2 * CPUs + 1.
+_web_concurrency = os.environ.get("WEB_CONCURRENCY", "1")
+workers = multiprocessing.cpu_count() * 2 + 1 if _web_concurrency == "auto" else int(_web_concurrency)
+# Each SocketIO client holds a socket open, so allow many per worker and lift the process's
+# open-file soft limit (commonly 1024) up to the hard limit the host allows.
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", "10000"))
+_nofile_soft, _nofile_hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+_nofile_target = 65535 if _nofile_hard == resource.RLIM_INFINITY else min(_nofile_hard, 65535)
+if _nofile_soft != resource.RLIM_INFINITY and _nofile_soft < _nofile_target:
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (_nofile_target, _nofile_hard))
+    except (ValueError, OSError):
+        pass
+keepalive = 30
+timeout = 60
+# The app is not preloaded: the Firestore client opens a gRPC channel at import, which isn't fork-safe,
+# so each worker imports the app (and builds its own client and caches) after forking.
+preload_app = False
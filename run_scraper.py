@@ -1,11 +1,22 @@
 import json
+import logging
+import os
 from scraper import scrape_football_news
 
+# Scraper progress is logged at INFO; LOG_LEVEL=DEBUG adds per-article detail
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(message)s")
+
+def save_json(filename, data):
+    """Writes JSON to a temp file and swaps it in, so the app never reads a half-written file."""
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_filename, filename)
+
 # Scrape all news
 news = scrape_football_news()
 if news:
-    with open("football_news.json", "w", encoding="utf-8") as f:
-        json.dump(news, f, indent=2)
+    save_json("football_news.json", news)
     print("News saved to football_news.json")
 else:
     print("No articles scraped.")
@@ -14,8 +25,7 @@ else:
 teams = ["Man Utd", "Arsenal", "Chelsea"]  # Adjust as needed
 filtered_news = scrape_football_news(teams=teams)
 if filtered_news:
-    with open("filtered_football_news.json", "w", encoding="utf-8") as f:
-        json.dump(filtered_news, f, indent=2)
+    save_json("filtered_football_news.json", filtered_news)
     print("Filtered news saved to filtered_football_news.json")
 else:
     print("No filtered articles scraped.")
\ No newline at end of file
@@ -1,49 +1,240 @@
-from selenium import webdriver
 from bs4 import BeautifulSoup
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+import logging
+import re
 import time
+import requests
+import soupsieve as sv
 
-def scrape_football_news(teams=None):
+try:
+    import lxml  # noqa: F401 -- only checked for, BeautifulSoup drives it
+    HTML_PARSER = "lxml"
+except ImportError:  # lxml is optional; the pure-Python parser is used as a fallback
+    HTML_PARSER = "html.parser"
+
+try:
+    import brotli  # noqa: F401 -- lets urllib3 decode br responses
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:  # brotli is optional; without a decoder only gzip/deflate can be accepted
+    ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    import h2  # noqa: F401 -- httpx needs it for HTTP/2
+    import httpx
+except ImportError:  # httpx[http2] is optional; article pages are then fetched over the requests session
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124"
+PROMO_SELECTOR = "div[data-testid='promo'][type='article']"
+
+# CSS selectors compiled once, rather than re-parsed by soupsieve on every select call
+PROMO_CSS = sv.compile(PROMO_SELECTOR)
+TITLE_CSS = sv.compile("p[class*='PromoHeadline'], a")
+LINK_CSS = sv.compile("a[href*='/sport/football/']")
+DATE_CSS = sv.compile("time, span[class*='Date']")
+ARTICLE_BODY_CSS = sv.compile("article, main")
+ARTICLE_FETCH_WORKERS = 4
+MAX_ARTICLES = 5
+# Lowercased headlines of promos that aren't gossip articles
+SKIP_TITLES = frozenset({"football gossip", "gossip", ""})
+
+# One session for the gossip index and every article page, so they share kept-alive connections to the BBC
+http = requests.Session()
+http.headers.update({"User-Agent": USER_AGENT, "Accept": "text/html", "Accept-Encoding": ACCEPT_ENCODING})
+
+# Deep-search article fetches all go to bbc.co.uk; over HTTP/2 the worker threads multiplex them on one connection
+article_http = None
+if httpx is not None:
+    article_http = httpx.Client(http2=True, timeout=10, headers={
+        "User-Agent": USER_AGENT, "Accept": "text/html", "Accept-Encoding": ACCEPT_ENCODING,
+    })
+
+# Validators and body of the last response per conditionally fetched URL: {url: (etag, last_modified, html)}
+_conditional_cache = {}
+
+def fetch_html(url, conditional=False):
+    """Fetches a page's server-rendered HTML with a plain HTTP request.
+
+    With conditional=True the previous response's ETag/Last-Modified are sent, and a 304 reuses its body.
+    """
+    headers = {}
+    cached = _conditional_cache.get(url) if conditional else None
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    response = http.get(url, headers=headers, timeout=10)
+    if cached and response.status_code == 304:
+        return cached[2]
+    response.raise_for_status()
+    if conditional:
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if etag or last_modified:
+            _conditional_cache[url] = (etag, last_modified, response.text)
+    return response.text
+
+def fetch_article_html(url):
+    """Fetches an article page, over the shared HTTP/2 client when httpx is installed."""
+    if article_http is None:
+        return fetch_html(url)
+    response = article_http.get(url)
+    response.raise_for_status()
+    return response.text
+
+# The fallback keeps one warm Chrome across scrapes in this process, replaced every DRIVER_MAX_USES pages
+# so a long-lived browser's memory doesn't keep growing; it is quit when the process exits.
+DRIVER_MAX_USES = 50
+_driver = None
+_driver_uses = 0
+
+def create_driver():
+    """Starts a headless Chrome configured to load only what the scraper reads."""
+    from selenium import webdriver  # Only needed for the Chrome fallback
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    # Only the DOM is read, so skip images, stylesheets and fonts along with Chrome's background work
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    })
+    for argument in ("--blink-settings=imagesEnabled=false", "--disable-gpu", "--no-sandbox",
+                     "--disable-dev-shm-usage", "--disable-extensions", "--disable-background-networking"):
+        options.add_argument(argument)
+    return webdriver.Chrome(options=options)
+
+def get_driver():
+    """Returns the warm Chrome, starting a fresh one if there is none or it has reached DRIVER_MAX_USES."""
+    global _driver, _driver_uses
+    if _driver is not None and _driver_uses >= DRIVER_MAX_USES:
+        shutdown_driver()
+    if _driver is None:
+        _driver = create_driver()
+        _driver_uses = 0
+    _driver_uses += 1
+    return _driver
+
+def shutdown_driver():
+    """Quits the warm Chrome, if one is running."""
+    global _driver
+    if _driver is not None:
+        try:
+            _driver.quit()
+        finally:
+            _driver = None
+
+atexit.register(shutdown_driver)
+
+@contextmanager
+def chrome_driver():
+    """Yields the warm Chrome, quitting it if the block raises so a broken browser is never reused or leaked."""
+    driver = get_driver()
+    try:
+        yield driver
+    except BaseException:  # Includes interrupts and gevent timeouts, which would otherwise strand the process
+        shutdown_driver()
+        raise
+
+def fetch_rendered_html(url):
+    """Fetches a page through headless Chrome, for when its articles are only rendered client-side."""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    with chrome_driver() as driver:
+        driver.get(url)
+        try:
+            # Wait only until the first articles render, rather than a fixed delay
+            WebDriverWait(driver, 8).until(EC.presence_of_element_located((By.CSS_SELECTOR, PROMO_SELECTOR)))
+
+            # Scroll to load more content, moving on as soon as new articles appear
+            for _ in range(2):  # Scroll twice for more articles
+                loaded = len(driver.find_elements(By.CSS_SELECTOR, PROMO_SELECTOR))
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight)")
+                WebDriverWait(driver, 3).until(lambda d: len(d.find_elements(By.CSS_SELECTOR, PROMO_SELECTOR)) > loaded)
+        except TimeoutException:
+            pass  # Use whatever has rendered so far
+
+        return driver.page_source
+
+def compile_team_pattern(teams):
+    """Returns one case-insensitive regex matching any of the team names."""
+    return re.compile("|".join(re.escape(team) for team in teams), re.IGNORECASE)
+
+def article_mentions_teams(link, team_re):
+    """Fetches an article page and reports whether its body text matches the team pattern."""
+    try:
+        article_soup = BeautifulSoup(fetch_article_html(link), HTML_PARSER)
+        # Scan the article body string by string and stop at the first mention, rather than joining the whole page
+        body = ARTICLE_BODY_CSS.select_one(article_soup) or article_soup
+        return any(team_re.search(text) for text in body.stripped_strings)
+    except Exception:
+        return False
+
+# Scrape results keyed by (lowercased team names, deep_search). The gossip page only changes a few times an hour;
+# empty results (including failed scrapes) expire sooner so a transient failure isn't served for long.
+SCRAPE_CACHE_TTL = 300
+EMPTY_SCRAPE_CACHE_TTL = 30
+_scrape_cache = {}
+
+def scrape_football_news(teams=None, deep_search=False):
     """
-    Scrape football gossip from BBC Sport using Selenium.
+    Scrape football gossip from BBC Sport, reusing a recent result for the same filter.
     Args:
         teams (list): Optional list of team names to filter (e.g., ['Man Utd', 'Arsenal']).
+        deep_search (bool): Also fetch article pages whose promo card doesn't name a team.
     Returns:
         list: List of dicts with title, link, date, and source.
     """
+    key = (tuple(sorted({team.lower() for team in teams})) if teams else (), deep_search)
+    now = time.monotonic()
+    cached = _scrape_cache.get(key)
+    if cached and cached[0] > now:
+        return list(cached[1])
+    articles = scrape_gossip_page(teams, deep_search)
+    _scrape_cache[key] = (now + (SCRAPE_CACHE_TTL if articles else EMPTY_SCRAPE_CACHE_TTL), articles)
+    return list(articles)
+
+def scrape_gossip_page(teams, deep_search):
+    """
+    Scrape football gossip from BBC Sport.
+    The gossip page is server-rendered, so it is fetched with requests; headless Chrome is only
+    used if that HTML contains no articles. Arguments and return value are as for scrape_football_news.
+    """
     url = "https://www.bbc.co.uk/sport/football/gossip"
     try:
-        print(f"Fetching {url}")
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124")
-        driver = webdriver.Chrome(options=options)
-        driver.get(url)
-        time.sleep(3)  # Wait for initial load
-
-        # Scroll to load more content
-        for _ in range(2):  # Scroll twice for more articles
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(2)
-
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        driver.quit()
+        logger.info("Fetching %s", url)
+        soup = BeautifulSoup(fetch_html(url, conditional=True), HTML_PARSER)
 
         # Target top-level promo containers
-        promo_items = soup.select("div[data-testid='promo'][type='article']")
-        print(f"Found {len(promo_items)} article elements")
+        promo_items = PROMO_CSS.select(soup)
+        if not promo_items:
+            logger.info("No articles in the served HTML; falling back to headless Chrome")
+            soup = BeautifulSoup(fetch_rendered_html(url), HTML_PARSER)
+            promo_items = PROMO_CSS.select(soup)
+        logger.info("Found %d article elements", len(promo_items))
 
-        articles = []
+        team_re = compile_team_pattern(teams) if teams else None
+        candidates = []  # (article, needs_body_check) in page order
+        confirmed = 0  # Candidates already known to match
         seen_links = set()  # Track unique links to avoid duplicates
         for item in promo_items:
-            print(f"\nProcessing item: {item.prettify()[:300]}...")
-            title_elem = item.select_one("p[class*='PromoHeadline'], a")
-            link_elem = item.select_one("a[href*='/sport/football/']")
-            date_elem = item.select_one("time, span[class*='Date']")
+            title_elem = TITLE_CSS.select_one(item)
+            link_elem = LINK_CSS.select_one(item)
+            date_elem = DATE_CSS.select_one(item)
 
-            print(f"Title elem: {title_elem}")
-            print(f"Link elem: {link_elem}")
-            print(f"Date elem: {date_elem}")
+            # Tags are only serialized if debug logging is on
+            logger.debug("Title elem: %s, link elem: %s, date elem: %s", title_elem, link_elem, date_elem)
 
             if title_elem and link_elem:
                 title = title_elem.get_text(strip=True)
@@ -52,36 +243,38 @@ def scrape_football_news(teams=None):
                     link = "https://www.bbc.co.uk" + link
                 date = date_elem.get_text(strip=True) if date_elem else datetime.now().strftime("%Y-%m-%d")
 
-                print(f"Extracted - Title: {title}, Link: {link}, Date: {date}")
+                logger.debug("Extracted - Title: %s, Link: %s, Date: %s", title, link, date)
 
                 # Skip non-gossip or duplicates
-                if title.lower() in ["football gossip", "gossip", ""] or link in seen_links:
+                if title.lower() in SKIP_TITLES or link in seen_links:
                     continue
                 seen_links.add(link)
 
-                # Filter by teams if provided
-                if teams:
-                    # Check title and article content for team names
-                    article_text = title.lower()
-                    if any(team.lower() in article_text for team in teams):
-                        articles.append({"title": title, "link": link, "date": date, "source": "BBC Sport"})
-                    else:
-                        # Optionally fetch article page for more content
-                        try:
-                            driver = webdriver.Chrome(options=options)
-                            driver.get(link)
-                            article_soup = BeautifulSoup(driver.page_source, "html.parser")
-                            driver.quit()
-                            content = article_soup.get_text(strip=True).lower()
-                            if any(team.lower() in content for team in teams):
-                                articles.append({"title": title, "link": link, "date": date, "source": "BBC Sport"})
-                        except:
-                            pass
-                else:
-                    articles.append({"title": title, "link": link, "date": date, "source": "BBC Sport"})
-
-        print(f"Scraped {len(articles)} articles")
-        return articles[:5]  # Limit to 5
+                article = {"title": title, "link": link, "date": date, "source": "BBC Sport"}
+                # Filter by teams if provided, against the promo card's own headline and summary
+                needs_body_check = False
+                if team_re:
+                    if not team_re.search(item.get_text(" ", strip=True)):
+                        if not deep_search:
+                            continue
+                        needs_body_check = True  # The article page is checked below
+                candidates.append((article, needs_body_check))
+                # Once MAX_ARTICLES confirmed matches are in hand, nothing later on the page can make the cut
+                if not needs_body_check:
+                    confirmed += 1
+                    if confirmed >= MAX_ARTICLES:
+                        break
+
+        # Article pages are independent network waits, so they are fetched concurrently
+        links_to_check = [article["link"] for article, needs_body_check in candidates if needs_body_check]
+        with ThreadPoolExecutor(max_workers=ARTICLE_FETCH_WORKERS) as executor:
+            mentions = dict(zip(links_to_check,
+                                executor.map(article_mentions_teams, links_to_check, [team_re] * len(links_to_check))))
+        articles = [article for article, needs_body_check in candidates
+                    if not needs_body_check or mentions[article["link"]]]
+
+        logger.info("Scraped %d articles", len(articles))
+        return articles[:MAX_ARTICLES]
     except Exception as e:
-        print(f"Error: {e}")
-        return []
\ No newline at end of file
+        logger.error("Error: %s", e)
+        return []